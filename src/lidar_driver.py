@@ -14,21 +14,96 @@ from __future__ import annotations
 import time
 from dataclasses import dataclass
 from typing import Iterable, List, Tuple
+import numpy as np
 from rplidar import RPLidar
 
 # Tipo para cada punto: (quality, angle_deg, dist_mm)
 ScanPoint = Tuple[int, float, float]
 
+# Punto en punto fijo, tal como lo entrega el sensor (5 bytes por punto):
+#   q       calidad [0-63]
+#   ang_q6  ángulo en 1/64 de grado   (angle_deg = ang_q6 / 64)
+#   dist_q2 distancia en 1/4 de mm    (dist_mm   = dist_q2 / 4)
+POINT_DTYPE = np.dtype([('q', 'u1'), ('ang_q6', 'u2'), ('dist_q2', 'u2')])
+
 @dataclass
 class ScanFrame:
     """Un barrido completo del sensor (aprox. 360°)."""
     t: float             # timestamp Unix (time.time())
-    pts: List[ScanPoint] # lista de (quality, angle_deg, dist_mm)
+    pts: np.ndarray      # array estructurado POINT_DTYPE (q, ang_q6, dist_q2)
+
+    def to_tuples(self) -> List[ScanPoint]:
+        """Devuelve los puntos como lista de ScanPoint (formato anterior)."""
+        return [(q, a / 64.0, d / 4.0) for q, a, d in self.pts.tolist()]
 
 # ── Umbrales de filtrado (Sensores ajusta estos valores) ─────────────
 QUALITY_MIN = 10     # descartar puntos con calidad menor
 DIST_MIN_MM = 150.0  # 15 cm → mínimo físico del sensor
 DIST_MAX_MM = 12000.0 # 12 m → máximo especificado
+# Los mismos umbrales en 1/4 de mm, para comparar directamente con dist_q2
+DIST_MIN_Q2 = int(DIST_MIN_MM * 4)
+DIST_MAX_Q2 = int(DIST_MAX_MM * 4)
+
+# ── Protocolo binario de escaneo (modo normal, comando 0x20) ─────────
+# Cada medida llega en un nodo de 5 bytes:
+#   byte 0: quality[7:2] | !S[1] | S[0]   (S = inicio de un barrido nuevo)
+#   byte 1: angle_q6[6:0] << 1 | C        (C = bit de control, siempre 1)
+#   byte 2: angle_q6[14:7]
+#   byte 3-4: distance_q2 (little endian)
+SCAN_CMD = b'\x20'
+SCAN_NODE_BYTES = 5
+
+# ── Control de latencia del puerto serie ─────────────────────────────
+# Si el consumidor va más lento que el sensor, el buffer USB-TTL se llena y
+# los frames llegan con segundos de retraso. Cada BACKLOG_CHECK_FRAMES frames
+# se mira el buffer y, si supera MAX_BACKLOG_BYTES, se descarta lo acumulado.
+BACKLOG_CHECK_FRAMES = 10
+MAX_BACKLOG_BYTES = 8 * 1024
+
+def points_from_scan(scan) -> np.ndarray:
+    """
+    Convierte un barrido de rplidar (lista de (quality, angle_deg, dist_mm))
+    a un array POINT_DTYPE en punto fijo.
+    """
+    arr = np.asarray(scan, dtype=np.float32).reshape(-1, 3)
+    pts = np.empty(len(arr), dtype=POINT_DTYPE)
+    pts['q'] = arr[:, 0]
+    pts['ang_q6'] = np.rint(arr[:, 1] * 64)
+    pts['dist_q2'] = np.clip(np.rint(arr[:, 2] * 4), 0, 0xFFFF)  # rango del campo u2
+    return pts
+
+def filter_points(pts: np.ndarray) -> np.ndarray:
+    """
+    Aplica los filtros de calidad y distancia a un array POINT_DTYPE y
+    devuelve solo los puntos que los superan (comparaciones enteras, sin
+    pasar a float). d >= DIST_MIN_Q2 descarta también las medidas nulas.
+    """
+    d = pts['dist_q2']
+    mask = (pts['q'] >= QUALITY_MIN) & (d >= DIST_MIN_Q2) & (d <= DIST_MAX_Q2)
+    return pts[mask]
+
+def decode_scan_nodes(buf: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decodifica de golpe un bloque de nodos de 5 bytes del protocolo de escaneo.
+
+    Args:
+        buf: bytes leídos del puerto, longitud múltiplo de SCAN_NODE_BYTES
+    Returns:
+        pts:      array POINT_DTYPE con (q, ang_q6, dist_q2), sin pasar a float
+        new_scan: array bool (N,), True donde empieza un barrido nuevo (bit S)
+        valid:    array bool (N,), False si el nodo no pasa las comprobaciones
+                  (S == !S o bit C a 0): indica pérdida de sincronismo
+    """
+    raw = np.frombuffer(buf, dtype=np.uint8).reshape(-1, SCAN_NODE_BYTES)
+    b0 = raw[:, 0]
+    new_scan = (b0 & 1).astype(bool)
+    valid = (((b0 ^ (b0 >> 1)) & 1) == 1) & ((raw[:, 1] & 1) == 1)
+
+    pts = np.empty(len(raw), dtype=POINT_DTYPE)
+    pts['q'] = b0 >> 2
+    pts['ang_q6'] = (raw[:, 1] >> 1).astype(np.uint16) | (raw[:, 2].astype(np.uint16) << 7)
+    pts['dist_q2'] = raw[:, 3].astype(np.uint16) | (raw[:, 4].astype(np.uint16) << 8)
+    return pts, new_scan, valid
 
 class LidarDriver:
     """Interfaz de alto nivel para el RPLIDAR A1M8."""
@@ -62,28 +137,96 @@ class LidarDriver:
             '_raw_health': health,
         }
 
-    def frames(self, max_buf_meas: int = 500) -> Iterable[ScanFrame]:
+    def frames(self, max_buf_meas: int = 0) -> Iterable[ScanFrame]:
         """ 
         Generador que produce ScanFrames en tiempo real.
         Args:
-            max_buf_meas: máximo de medidas en buffer interno (evita lag)
+            max_buf_meas: máximo de medidas en buffer interno de rplidar
+                          (0 = desactivado; la latencia se controla con
+                          drop_backlog() cada BACKLOG_CHECK_FRAMES frames)
         Yields:
-            ScanFrame con timestamp y lista de puntos filtrados.
+            ScanFrame con timestamp y array POINT_DTYPE de puntos filtrados.
         """
-        for scan in self.lidar.iter_scans(max_buf_meas=max_buf_meas):
-            pts: List[ScanPoint] = []
-            for q, a, d in scan:
-                # Filtros de distancia y calidad
-                if d <= 0 or q < QUALITY_MIN:
-                    continue
-                if not (DIST_MIN_MM <= d <= DIST_MAX_MM):
-                    continue
-                
-                pts.append((int(q), float(a), float(d)))
-            
-            if pts: # No emitir frames vacíos
+        for i, scan in enumerate(self.lidar.iter_scans(max_buf_meas=max_buf_meas), 1):
+            if i % BACKLOG_CHECK_FRAMES == 0:
+                self.drop_backlog()
+
+            # Todo el barrido a punto fijo de una vez y filtros vectorizados
+            pts = filter_points(points_from_scan(scan))
+
+            if len(pts): # No emitir frames vacíos
                 yield ScanFrame(t=time.time(), pts=pts)
 
+    def drop_backlog(self, max_bytes: int = MAX_BACKLOG_BYTES) -> int:
+        """
+        Descarta las medidas acumuladas en el buffer de entrada del puerto
+        si superan max_bytes, para que el siguiente frame sea reciente.
+        Se leen y tiran nodos completos de 5 bytes (no reset_input_buffer())
+        para no desalinear el flujo que decodifica rplidar.
+        Returns:
+            Número de bytes descartados (0 si no hacía falta).
+        """
+        serial = self._serial()
+        waiting = serial.in_waiting
+        if waiting <= max_bytes:
+            return 0
+        dropped = len(serial.read(waiting // SCAN_NODE_BYTES * SCAN_NODE_BYTES))
+        print(f'[WARN] latency-drop: {dropped} bytes descartados del buffer serie')
+        return dropped
+
+    def _serial(self):
+        """Puerto serie de RPLidar (el atributo cambia de nombre entre versiones de rplidar)."""
+        port = getattr(self.lidar, '_serial_port', None)
+        return port if port is not None else self.lidar._serial
+
+    def frames_raw(self, chunk_nodes: int = 256) -> Iterable[ScanFrame]:
+        """
+        Igual que frames(), pero leyendo directamente el puerto serie y
+        decodificando chunk_nodes nodos de 5 bytes por lectura con numpy
+        (decode_scan_nodes), sin el bucle por muestra de rplidar.
+
+        Si un nodo no pasa las comprobaciones del protocolo se descarta un
+        byte en esa posición y se vuelve a alinear el flujo.
+        Args:
+            chunk_nodes: nodos leídos por cada llamada a read()
+        Yields:
+            ScanFrame con timestamp y array POINT_DTYPE de puntos filtrados.
+        """
+        self.lidar.start_motor()
+        self.lidar._send_cmd(SCAN_CMD)
+        dsize, _, _ = self.lidar._read_descriptor()
+        if dsize != SCAN_NODE_BYTES:
+            raise RuntimeError(f'Descriptor de escaneo inesperado (dsize={dsize})')
+
+        serial = self._serial()
+        pending = b''      # bytes leídos que aún no forman un nodo completo
+        parts = []         # trozos POINT_DTYPE del barrido en curso
+        while True:
+            pending += serial.read(chunk_nodes * SCAN_NODE_BYTES - len(pending))
+            n_nodes = len(pending) // SCAN_NODE_BYTES
+            if n_nodes == 0:
+                continue
+            pts, new_scan, valid = decode_scan_nodes(pending[:n_nodes * SCAN_NODE_BYTES])
+
+            # Pérdida de sincronismo: usar lo anterior al nodo roto y desplazar 1 byte
+            bad = np.flatnonzero(~valid)
+            if bad.size:
+                cut = int(bad[0])
+                pts, new_scan = pts[:cut], new_scan[:cut]
+                pending = pending[cut * SCAN_NODE_BYTES + 1:]
+            else:
+                pending = pending[n_nodes * SCAN_NODE_BYTES:]
+
+            # Cortar el bloque en cada bit S: cada corte cierra el barrido anterior
+            start = 0
+            for i in np.flatnonzero(new_scan).tolist():
+                parts.append(pts[start:i])
+                frame = filter_points(np.concatenate(parts))
+                if len(frame): # No emitir frames vacíos
+                    yield ScanFrame(t=time.time(), pts=frame)
+                parts, start = [], i
+            parts.append(pts[start:])
+
     def shutdown_safe(self) -> None:
         """
         Parada segura del sensor.
@@ -104,6 +247,8 @@ if __name__ == '__main__':
     
     ap = argparse.ArgumentParser()
     ap.add_argument('--port', required=True, help='Puerto serie del sensor')
+    ap.add_argument('--raw', action='store_true',
+                    help='Usar frames_raw() (decodificación directa del puerto serie)')
     args = ap.parse_args()
 
     d = LidarDriver(args.port)
@@ -112,7 +257,7 @@ if __name__ == '__main__':
         print('Leyendo 3 frames...')
         
         count = 0
-        for fr in d.frames():
+        for fr in (d.frames_raw() if args.raw else d.frames()):
             print(f' Frame {count}: {len(fr.pts)} puntos, t={fr.t:.2f}')
             count += 1
             if count >= 3:
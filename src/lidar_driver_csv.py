@@ -5,19 +5,46 @@ Propietario: Sensores.
 Formato del CSV (header obligatorio):
     quality, angle, measure_m, ok
 Uso:
-    samples = read_scan_csv('data/scan_720.csv')
-    print(dataset_health(samples))
+    scan = read_scan_csv('data/scan_720.csv')
+    print(dataset_health(scan))
+    samples = list(iter_samples(scan))  # LidarSample por fila (is_valid / polar_to_xy)
 """
 
 from __future__ import annotations
 import csv
+import io
+import os
+import itertools
+import mmap
 import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List
+from pathlib import Path
+from typing import Dict, Iterator, List
+import numpy as np
 
 # Header exacto que debe tener el CSV (no modificar)
 CSV_HEADER = ['quality', 'angle', 'measure_m', 'ok']
 
+# Tipo de cada columna en memoria. Se guarda en formato SoA (Struct of
+# Arrays): un array numpy contiguo por columna en lugar de un objeto por fila.
+# angle / measure_m en float64: son los mismos valores que float(texto) del CSV,
+# así que comparaciones con umbrales (0.20 m...) y valores devueltos no
+# arrastran el redondeo de float32. La visualización baja a float32 por su cuenta.
+CSV_DTYPE = [('quality', 'i2'), ('angle', 'f8'), ('measure_m', 'f8'), ('ok', 'i1')]
+
+# Scan en formato SoA: {'quality': int16[N], 'angle': float64[N],
+#                       'measure_m': float64[N], 'ok': int8[N]}
+ScanArrays = Dict[str, np.ndarray]
+
+# A partir de este tamaño el CSV se mapea en memoria y se parsea en paralelo
+# (logs concatenados); un scan de 720 filas se lee directamente.
+MMAP_MIN_BYTES = 8 * 1024 * 1024
+
+# Filas por bloque en la lectura por streaming (iter_scan_batches)
+BATCH_ROWS = 64 * 1024
+
 @dataclass
 class LidarSample:
     """Una muestra individual del CSV (equivale a un ScanPoint + flag ok)."""
@@ -26,85 +53,219 @@ class LidarSample:
     measure_m: float  # distancia en metros
     ok: int           # 1 = válida según el sensor, 0 = sospechosa
 
-def read_scan_csv(path: str) -> List[LidarSample]:
+def _rec_to_scan(rec: np.ndarray) -> ScanArrays:
+    """
+    Pasa un array estructurado CSV_DTYPE al formato SoA. Lanza ValueError si
+    angle o measure_m contienen NaN (un campo vacío ya lo rechaza np.loadtxt).
+    """
+    scan = {name: np.ascontiguousarray(rec[name]) for name in CSV_HEADER}
+    for name in ('angle', 'measure_m'):
+        if np.isnan(scan[name]).any():
+            raise ValueError(f"Valor no numérico (NaN) en la columna '{name}'")
+    return scan
+
+def _parse_rows(f) -> ScanArrays:
+    """
+    Parsea filas de datos (sin header) desde un fichero de texto abierto,
+    con np.loadtxt directamente a un array estructurado.
+    """
+    first = f.readline()
+    if not first:  # CSV solo con header: np.loadtxt lanzaría un UserWarning
+        return {name: np.empty(0, dtype=dt) for name, dt in CSV_DTYPE}
+    rows = itertools.chain([first], f)
+    return _rec_to_scan(np.loadtxt(rows, delimiter=',', dtype=CSV_DTYPE, ndmin=1))
+
+def _read_scan_mmap(path: str, workers: int | None = None) -> ScanArrays:
+    """
+    Camino rápido para logs grandes: mapea el fichero en memoria, localiza
+    los saltos de línea en una sola pasada numpy, reparte el cuerpo en
+    bloques alineados a fin de línea y los parsea en paralelo con hilos.
+    El header debe haberse validado antes (se salta la primera línea).
+    """
+    with open(path, 'rb') as fb, \
+         mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        raw = np.frombuffer(mm, dtype=np.uint8)
+        newlines = np.flatnonzero(raw == 0x0A)
+        size = raw.size
+        del raw  # liberar la vista antes de cerrar el mmap
+
+        start = int(newlines[0]) + 1 if newlines.size else size
+        k = workers or os.cpu_count() or 1
+
+        # Cortes equiespaciados, desplazados al siguiente fin de línea
+        cuts = np.linspace(start, size, k + 1).astype(np.int64)[1:-1]
+        idx = np.searchsorted(newlines, cuts)
+        ends = [int(newlines[i]) + 1 if i < newlines.size else size for i in idx]
+        bounds = sorted(set([start, *ends, size]))
+        ranges = [(lo, hi) for lo, hi in zip(bounds, bounds[1:]) if hi > lo]
+
+        def parse(rng):
+            lo, hi = rng
+            return _parse_rows(io.TextIOWrapper(io.BytesIO(mm[lo:hi]), encoding='utf-8'))
+
+        with ThreadPoolExecutor(max_workers=k) as ex:
+            parts = list(ex.map(parse, ranges))
+
+    if not parts:
+        return {name: np.empty(0, dtype=dt) for name, dt in CSV_DTYPE}
+    return {name: np.concatenate([p[name] for p in parts]) for name in CSV_HEADER}
+
+def _check_header(f) -> None:
+    """
+    Lee la primera línea de f y lanza ValueError si no coincide
+    exactamente con CSV_HEADER. Deja f posicionado en la primera fila de datos.
     """
-    Lee el CSV y devuelve una lista de LidarSample.
+    fieldnames = next(csv.reader(f), [])
+    if fieldnames != CSV_HEADER:
+        raise ValueError(
+            f'Header inválido.\n'
+            f'Esperado: {CSV_HEADER}\n'
+            f'Recibido: {fieldnames}'
+        )
+
+def read_scan_csv(path: str) -> ScanArrays:
+    """
+    Lee el CSV y devuelve un dict con un array numpy por columna (ver ScanArrays).
     Lanza ValueError si el header no coincide exactamente con CSV_HEADER.
+    Ficheros de más de MMAP_MIN_BYTES se leen con _read_scan_mmap().
     """
-    samples: List[LidarSample] = []
     with open(path, 'r', newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        
-        # Validación de cabecera
-        if list(reader.fieldnames) != CSV_HEADER:
-            raise ValueError(
-                f'Header inválido.\n'
-                f'Esperado: {CSV_HEADER}\n'
-                f'Recibido: {reader.fieldnames}'
-            )
-            
-        for row in reader:
-            samples.append(LidarSample(
-                quality=int(row['quality']),
-                angle=float(row['angle']),
-                measure_m=float(row['measure_m']),
-                ok=int(row['ok']),
-            ))
-    return samples
-
-def dataset_health(samples: List[LidarSample]) -> dict:
+        _check_header(f)
+
+        if os.path.getsize(path) < MMAP_MIN_BYTES:
+            return _parse_rows(f)
+
+    return _read_scan_mmap(path)
+
+def save_npy_atomic(path: Path, arr: np.ndarray) -> None:
+    """
+    np.save() a un temporal en la misma carpeta y os.replace() sobre path:
+    un lector nunca ve un .npy a medio escribir (corte, disco lleno...).
+    Lanza OSError si no se puede escribir; el temporal se borra.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, arr)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def read_scan_cached(path: str) -> ScanArrays:
+    """
+    Igual que read_scan_csv(), pero guarda junto al CSV una copia binaria
+    '<csv>.npy' (array estructurado CSV_DTYPE). Si esa copia existe y no es
+    más antigua que el CSV se abre con np.load(mmap_mode='r'): sin parseo,
+    y las columnas devueltas son vistas sobre el fichero mapeado.
+    Una copia ilegible (truncada, corrupta) se trata como si no existiera.
+    """
+    csv_path = Path(path)
+    npy_path = csv_path.with_name(csv_path.name + '.npy')
+
+    if npy_path.exists() and npy_path.stat().st_mtime >= csv_path.stat().st_mtime:
+        try:
+            rec = np.load(npy_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f'[WARN] read_scan_cached: copia {npy_path} ilegible, se regenera: {e}')
+        else:
+            if rec.dtype == np.dtype(CSV_DTYPE):  # copias con otro dtype se regeneran
+                return {name: rec[name] for name in CSV_HEADER}
+            del rec  # cerrar el mapeo antes de reemplazar el fichero (Windows)
+
+    scan = read_scan_csv(path)
+    rec = np.empty(len(scan['quality']), dtype=CSV_DTYPE)
+    for name in CSV_HEADER:
+        rec[name] = scan[name]
+    try:
+        save_npy_atomic(npy_path, rec)
+    except OSError as e:
+        print(f'[WARN] read_scan_cached: no se pudo guardar {npy_path}: {e}')
+    return scan
+
+def iter_scan_batches(path: str, batch_rows: int = BATCH_ROWS) -> Iterator[ScanArrays]:
+    """
+    Lee el CSV por bloques de hasta batch_rows filas, cada uno en el mismo
+    formato SoA que read_scan_csv(), sin cargar nunca el scan completo.
+    Lanza ValueError si el header no coincide exactamente con CSV_HEADER.
+    """
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        _check_header(f)
+
+        while True:
+            lines = list(itertools.islice(f, batch_rows))
+            if not lines:
+                return
+            yield _rec_to_scan(np.loadtxt(lines, delimiter=',', dtype=CSV_DTYPE, ndmin=1))
+
+def iter_samples(scan: ScanArrays) -> Iterator[LidarSample]:
+    """
+    Recorre el scan SoA como LidarSample (compatibilidad con el contrato por
+    muestra de lidar_processing: is_valid(), polar_to_xy(), filter_and_project()).
+    Las columnas son float64, así que cada muestra tiene los mismos valores que
+    float(texto) del CSV y los umbrales comparan igual que en valid_mask().
+    """
+    for q, a, m, ok in zip(scan['quality'].tolist(), scan['angle'].tolist(),
+                           scan['measure_m'].tolist(), scan['ok'].tolist()):
+        yield LidarSample(quality=q, angle=a, measure_m=m, ok=ok)
+
+def dataset_health(scan: ScanArrays) -> dict:
     """
     Resumen estadístico del dataset, análogo a get_health() del sensor real.
     """
-    n = len(samples)
+    n = len(scan['quality'])
     if n == 0:
         return {'count': 0}
-        
-    measures = [s.measure_m for s in samples]
-    qualities = [s.quality for s in samples]
-    angles = [s.angle for s in samples]
-    
+
+    measures = scan['measure_m']
+    angles = scan['angle']
+    qualities = scan['quality']
+
     return {
         'count': n,
-        'ok_ratio': sum(1 for s in samples if s.ok == 1) / n,
-        'quality_min': min(qualities),
-        'quality_max': max(qualities),
-        'quality_mean': sum(qualities) / n,
-        'measure_min_m': min(measures),
-        'measure_max_m': max(measures),
-        'angle_min_deg': min(angles),
-        'angle_max_deg': max(angles),
+        'ok_ratio': float(np.count_nonzero(scan['ok'] == 1)) / n,
+        'quality_min': int(qualities.min()),
+        'quality_max': int(qualities.max()),
+        'quality_mean': float(qualities.mean()),
+        'measure_min_m': float(measures.min()),
+        'measure_max_m': float(measures.max()),
+        'angle_min_deg': float(angles.min()),
+        'angle_max_deg': float(angles.max()),
     }
 
-def detect_outliers(samples: List[LidarSample]) -> List[dict]:
+# Motivos de descarte, uno por bit del código que calcula detect_outliers():
+# bit 0 = demasiado cerca, bit 1 = fuera de rango, bit 2 = baja calidad.
+# _OUTLIER_REASONS[code] da la lista ya compuesta para cada combinación.
+_REASON_BITS = ("Demasiado cerca/Zero", "Fuera de rango max", "Baja calidad")
+_OUTLIER_REASONS = tuple(
+    tuple(r for bit, r in enumerate(_REASON_BITS) if code >> bit & 1)
+    for code in range(1 << len(_REASON_BITS))
+)
+
+def detect_outliers(scan: ScanArrays) -> List[dict]:
     """
     Identifica puntos que no cumplen con los estándares de calidad.
     """
-    outliers = []
-    for i, s in enumerate(samples):
-        # Criterios de fallo (basados en especificaciones técnicas del A1M8)
-        motivo = []
-        
-        # Rango mínimo físico (aprox 15cm)
-        if s.measure_m <= 0.15: 
-            motivo.append("Demasiado cerca/Zero")
-            
-        # Rango máximo teórico (12m para A1M8)
-        if s.measure_m > 12.0: 
-            motivo.append("Fuera de rango max")
-            
-        # Calidad mínima para navegación confiable
-        if s.quality < 20: 
-            motivo.append("Baja calidad")
-        
-        if motivo:
-            outliers.append({
-                'index': i,
-                'angle': s.angle,
-                'dist': s.measure_m,
-                'reasons': motivo
-            })
-    return outliers
+    measures = scan['measure_m']
+
+    # Criterios de fallo (basados en especificaciones técnicas del A1M8),
+    # empaquetados en un código de 3 bits por muestra sin ramas:
+    code = (measures <= 0.15).view(np.uint8)           # Rango mínimo físico (aprox 15cm)
+    code |= (measures > 12.0).view(np.uint8) << 1      # Rango máximo teórico (12m para A1M8)
+    code |= (scan['quality'] < 20).view(np.uint8) << 2  # Calidad mínima para navegación confiable
+
+    # Solo se recorren los índices con algún bit activo (normalmente pocos)
+    idx = np.flatnonzero(code)
+    return [
+        {
+            'index': i,
+            'angle': a,
+            'dist': d,
+            'reasons': list(_OUTLIER_REASONS[c]),
+        }
+        for i, c, a, d in zip(idx.tolist(), code[idx].tolist(),
+                              scan['angle'][idx].tolist(), measures[idx].tolist())
+    ]
 
 # ── Ejecución del script ─────────────────────────────────────────────
 
@@ -8,18 +8,57 @@ CONTRATO DE INTERFAZ:
   - polar_to_xy(sample)       → (float, float)   # (x_m, y_m)
   - filter_and_project(samples) → List[(x,y,q,a,r)]
 
+Versión vectorizada sobre el scan SoA de lidar_driver_csv.read_scan_csv():
+  - valid_mask(scan)                → ndarray[bool]
+  - filter_and_project_arrays(scan) → (x, y, q, a, r) como ndarrays
+
+Procesamiento posterior:
+  - cluster_by_range(x, y, r, angle) → (labels, centroids, sizes)
+
 Cualquier cambio en estas firmas debe comunicarse al equipo completo
 antes de modificar el archivo.
 """
 from __future__ import annotations
 import math
 from typing import List, Tuple
+import numpy as np
+
+try:
+    import numexpr as ne  # opcional: evalúa valid_mask() en un solo kernel multihilo
+except ImportError:
+    ne = None
 
 # ── Umbrales de filtrado (ajustar tras caracterizar el sensor) ──────
 QUALITY_MIN  = 20      # calidad mínima aceptable [0-255]
 DIST_MIN_M   = 0.20    # distancia mínima válida en metros
 DIST_MAX_M   = 10.0    # distancia máxima válida en metros
 
+# ── Parámetros de clustering ─────────────────────────────────────────
+CLUSTER_DR_M       = 0.10  # salto de rango entre vecinos que separa dos objetos
+CLUSTER_MIN_POINTS = 3     # clusters más pequeños se consideran ruido
+CLUSTER_MAX_GAP_DEG = 2.0  # hueco angular máximo entre vecinos del mismo cluster
+
+# Por debajo de este nº de muestras numexpr no compensa su coste de arranque
+# y valid_mask() usa numpy directamente (un scan de 720 puntos va por numpy).
+NUMEXPR_MIN_SIZE = 1 << 16
+_VALID_EXPR = '(ok == 1) & (quality >= qmin) & (measure_m > dmin) & (measure_m <= dmax)'
+
+# ── Tablas seno/coseno precalculadas ─────────────────────────────────
+# El A1M8 cuantiza el ángulo en pasos de 1/64° (angle_q6), así que solo
+# existen 360*64 ángulos distintos: se calcula la trigonometría una vez
+# al importar y polar_to_xy() pasa a ser dos lecturas de tabla.
+# Las tablas son float64 (~180 KB cada una) y se calculan con math.radians /
+# math.cos / math.sin: cada entrada es exactamente lo que daría el cálculo
+# directo. Los visores que trabajan en float32 hacen su propia copia.
+ANGLE_Q6_STEPS = 360 * 64
+# Copia en listas Python para el camino escalar: indexar una lista con un
+# int es más rápido que indexar un ndarray elemento a elemento.
+_ANGLES_RAD = [math.radians(k / 64) for k in range(ANGLE_Q6_STEPS)]
+_COS_LIST = [math.cos(t) for t in _ANGLES_RAD]
+_SIN_LIST = [math.sin(t) for t in _ANGLES_RAD]
+COS_TABLE = np.array(_COS_LIST)
+SIN_TABLE = np.array(_SIN_LIST)
+
 
 def is_valid(sample) -> bool:
     """
@@ -32,7 +71,8 @@ def is_valid(sample) -> bool:
 
     Args:
         sample: objeto con atributos ok, quality, measure_m
-                (compatible con LidarSample de lidar_driver_csv.py)
+                (compatible con LidarSample de lidar_driver_csv.py; para un
+                scan SoA usar lidar_driver_csv.iter_samples(scan))
     Returns:
         True si la muestra supera todos los filtros, False en caso contrario.
     """
@@ -53,27 +93,110 @@ def polar_to_xy(sample) -> Tuple[float, float]:
     El eje X apunta a 0° (frente del sensor).
     El eje Y apunta a 90° (izquierda del sensor).
 
+    Si el ángulo cae en la rejilla de 1/64° del sensor (lo normal) se busca
+    en COS_TABLE / SIN_TABLE en lugar de llamar a math.cos / math.sin; si no,
+    se calcula directamente. El resultado es el mismo en ambos casos.
+
     Args:
         sample: objeto con atributos angle (grados) y measure_m (metros)
     Returns:
         Tupla (x_m, y_m) en metros.
     """
-    rad = math.radians(sample.angle)
-    x = sample.measure_m * math.cos(rad)
-    y = sample.measure_m * math.sin(rad)
+    a64 = sample.angle * 64
+    i = round(a64)
+    if i != a64 or not 0 <= i < ANGLE_Q6_STEPS:
+        rad = math.radians(sample.angle)  # fuera de la rejilla de 1/64°
+        return sample.measure_m * math.cos(rad), sample.measure_m * math.sin(rad)
+    x = sample.measure_m * _COS_LIST[i]
+    y = sample.measure_m * _SIN_LIST[i]
     return x, y
 
 
+def valid_mask(scan) -> np.ndarray:
+    """
+    Versión vectorizada de is_valid(): mismos criterios, evaluados de una vez
+    sobre todas las columnas del scan. Con numexpr instalado y scans grandes
+    (>= NUMEXPR_MIN_SIZE) la expresión completa se compila una vez y se
+    evalúa en una sola pasada multihilo, sin arrays booleanos intermedios.
+    Calcular la máscara una vez y pasarla a filter_and_project_arrays().
+
+    Args:
+        scan: dict SoA con arrays ok, quality, measure_m
+              (ScanArrays de lidar_driver_csv.py)
+    Returns:
+        Array booleano, True en las muestras que superan todos los filtros.
+    """
+    measure = scan['measure_m']
+    if ne is not None and len(measure) >= NUMEXPR_MIN_SIZE:
+        # Umbrales con el dtype de la columna: mismo resultado que la comparación numpy
+        as_measure = measure.dtype.type
+        return ne.evaluate(_VALID_EXPR, local_dict={
+            'ok': scan['ok'], 'quality': scan['quality'], 'measure_m': measure,
+            'qmin': QUALITY_MIN, 'dmin': as_measure(DIST_MIN_M), 'dmax': as_measure(DIST_MAX_M),
+        })
+    return ((scan['ok'] == 1)
+            & (scan['quality'] >= QUALITY_MIN)
+            & (measure > DIST_MIN_M)
+            & (measure <= DIST_MAX_M))
+
+
+def angle_index(angle_deg) -> np.ndarray:
+    """
+    Índice en COS_TABLE / SIN_TABLE para uno o varios ángulos en grados
+    (redondeo al paso de 1/64° del sensor).
+    """
+    return np.rint(np.asarray(angle_deg) * 64).astype(np.intp) % ANGLE_Q6_STEPS
+
+
+def filter_and_project_arrays(scan, mask: np.ndarray | None = None) -> Tuple[np.ndarray, ...]:
+    """
+    Filtra y proyecta a XY todo el scan en una sola pasada vectorizada
+    (sin objetos ni llamadas por muestra).
+
+    Args:
+        scan: dict SoA de lidar_driver_csv.read_scan_csv()
+        mask: resultado de valid_mask(scan) si el llamador ya lo tiene
+              calculado (evita evaluar el filtro dos veces)
+    Returns:
+        Tupla de arrays (x_m, y_m, quality, angle_deg, measure_m),
+        solo con las muestras que superaron valid_mask().
+    """
+    if mask is None:
+        mask = valid_mask(scan)
+    q = scan['quality'][mask]
+    a = scan['angle'][mask]
+    r = scan['measure_m'][mask]
+
+    # Tablas para los ángulos en la rejilla de 1/64° en [0, 360); el resto
+    # (CSV editado a mano, ángulos con más decimales) se calcula con np.cos / np.sin
+    a64 = a * 64
+    k = np.rint(a64)
+    off = (k != a64) | (k < 0) | (k >= ANGLE_Q6_STEPS)
+    i = np.where(off, 0, k).astype(np.intp)
+    x = r * COS_TABLE[i]
+    y = r * SIN_TABLE[i]
+    if off.any():
+        rad = np.radians(a[off])
+        x[off] = r[off] * np.cos(rad)
+        y[off] = r[off] * np.sin(rad)
+    return x, y, q, a, r
+
+
 def filter_and_project(samples) -> List[Tuple]:
     """
     Aplica is_valid() a cada muestra y proyecta las válidas a XY.
 
     Args:
-        samples: lista de LidarSample
+        samples: lista de LidarSample, o el dict SoA de read_scan_csv()
+                 (en ese caso se usa filter_and_project_arrays())
     Returns:
         Lista de tuplas (x_m, y_m, quality, angle_deg, measure_m)
         Solo contiene muestras que superaron is_valid().
     """
+    if isinstance(samples, dict):
+        cols = filter_and_project_arrays(samples)
+        return list(zip(*(c.tolist() for c in cols)))
+
     result = []
     for s in samples:
         if is_valid(s):
@@ -82,5 +205,62 @@ def filter_and_project(samples) -> List[Tuple]:
     return result
 
 
+def cluster_by_range(x, y, r, angle,
+                     dr_thresh: float = CLUSTER_DR_M,
+                     min_points: int = CLUSTER_MIN_POINTS,
+                     max_gap_deg: float = CLUSTER_MAX_GAP_DEG):
+    """
+    Agrupa puntos consecutivos en ángulo cuya distancia al sensor cambia
+    menos de dr_thresh entre vecinos (segmentación por salto de rango).
+    También se corta el segmento si entre dos vecinos hay un hueco angular
+    mayor que max_gap_deg (puntos eliminados por el filtro): dos paredes
+    separadas a un rango parecido no deben acabar en el mismo cluster.
+
+    Todo vectorizado: una ordenación por ángulo (O(N log N)) y reducciones
+    O(N) con np.bincount. El primer y el último segmento se unen solo si se
+    tocan a través de 360° → 0° (hueco angular <= max_gap_deg) y el salto de
+    rango entre ellos tampoco supera dr_thresh (objeto que cruza 0°).
+
+    Args:
+        x, y: coordenadas cartesianas en metros (p. ej. de filter_and_project_arrays)
+        r: distancia en metros de cada punto
+        angle: ángulo en grados de cada punto
+        dr_thresh: salto de rango máximo entre vecinos del mismo cluster
+        min_points: tamaño mínimo para conservar un cluster
+        max_gap_deg: hueco angular máximo entre vecinos del mismo cluster
+    Returns:
+        labels: array int (N,) con el id de cluster de cada punto (en el orden
+                de entrada), -1 si su cluster se descartó por pequeño
+        centroids: array (K, 2) con el centroide (x, y) de cada cluster
+        sizes: array int (K,) con el número de puntos de cada cluster
+    """
+    n = len(r)
+    if n == 0:
+        return np.empty(0, dtype=np.intp), np.empty((0, 2)), np.empty(0, dtype=np.intp)
+
+    order = np.argsort(angle, kind='stable')
+    r_s = np.asarray(r)[order]
+    a_s = np.asarray(angle)[order]
+    breaks = (np.abs(np.diff(r_s)) > dr_thresh) | (np.diff(a_s) > max_gap_deg)
+    seg = np.concatenate(([0], np.cumsum(breaks)))  # segmento de cada punto ordenado
+
+    n_seg = int(seg[-1]) + 1
+    wrap_gap = 360.0 - a_s[-1] + a_s[0]  # hueco angular entre el último y el primero
+    if n_seg > 1 and wrap_gap <= max_gap_deg and abs(r_s[-1] - r_s[0]) <= dr_thresh:
+        seg[seg == n_seg - 1] = 0
+        n_seg -= 1
+
+    sizes = np.bincount(seg, minlength=n_seg)
+    cx = np.bincount(seg, weights=np.asarray(x)[order], minlength=n_seg) / sizes
+    cy = np.bincount(seg, weights=np.asarray(y)[order], minlength=n_seg) / sizes
+
+    keep = sizes >= min_points
+    new_id = np.full(n_seg, -1, dtype=np.intp)
+    new_id[keep] = np.arange(np.count_nonzero(keep))
+    labels = np.empty(n, dtype=np.intp)
+    labels[order] = new_id[seg]
+    return labels, np.column_stack((cx[keep], cy[keep])), sizes[keep]
+
+
 # TODO [LiDAR líder]: ampliar con más funciones de procesamiento si el
 # equipo las necesita durante la integración. Documentar cada una.
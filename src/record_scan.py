@@ -1,27 +1,77 @@
 """
 record_scan.py
-Graba escaneos en tiempo real a un CSV con timestamp.
+Graba escaneos en tiempo real a un fichero binario .npy con timestamp.
 Propietario: Computación.
 
-Formato CSV de salida:
+Formato de salida (registro fijo de 13 bytes por punto, ver RECORD_DTYPE),
+en el mismo punto fijo que entrega el sensor:
+ t (f8), q (u1), ang_q6 (u2, 1/64 de grado), dist_q2 (u2, 1/4 de mm)
+
+Se carga con np.load('scan_xxx.npy', mmap_mode='r') sin parsear texto.
+Con --csv se genera además el CSV clásico al terminar la grabación:
  t, quality, angle_deg, dist_mm
 
 Uso:
  python src/record_scan.py --port /dev/ttyUSB0 --seconds 10 --out data
  python src/record_scan.py --port /dev/ttyUSB0 --decimation 5
+ python src/record_scan.py --port /dev/ttyUSB0 --csv
 """
 
 from __future__ import annotations
-import argparse, csv, time
+import argparse, time
 from pathlib import Path
+import numpy as np
 from lidar_driver import LidarDriver
 
+# Registro binario de cada punto grabado
+RECORD_DTYPE = np.dtype([('t', 'f8'), ('q', 'u1'), ('ang_q6', 'u2'), ('dist_q2', 'u2')])
+
+CSV_HEADER = 't,quality,angle_deg,dist_mm'
+CSV_ROW_FMT = '%.4f,%d,%.3f,%.1f'
+
+# Escrituras a disco en bloques grandes (menos llamadas al sistema)
+WRITE_BUFFER = 1 << 20
+EXPORT_BLOCK_ROWS = 64 * 1024
+
+
+def write_npy_header(f, n_rows: int) -> None:
+    """
+    Escribe (o reescribe, con f.seek(0)) la cabecera .npy para n_rows registros.
+    numpy reserva hueco para que la longitud de la cabecera no dependa del
+    número de filas, así que se puede volver a escribir al final sin mover
+    los datos.
+    """
+    np.lib.format.write_array_header_1_0(f, {
+        'descr': np.lib.format.dtype_to_descr(RECORD_DTYPE),
+        'fortran_order': False,
+        'shape': (n_rows,),
+    })
+
+
+def export_csv(npy_path: Path, csv_path: Path, block_rows: int = EXPORT_BLOCK_ROWS) -> None:
+    """
+    Exporta una grabación .npy al CSV clásico (t, quality, angle_deg, dist_mm).
+    Se procesa por bloques de block_rows filas: cada bloque se formatea
+    entero en un único str y se escribe con una sola llamada a write().
+    """
+    data = np.load(npy_path, mmap_mode='r')
+    with open(csv_path, 'w', encoding='utf-8', newline='', buffering=WRITE_BUFFER) as f:
+        f.write(CSV_HEADER + '\n')
+        for i in range(0, len(data), block_rows):
+            blk = data[i:i + block_rows]
+            # El paso a grados / mm se hace solo aquí, al exportar
+            rows = zip(blk['t'].tolist(), blk['q'].tolist(),
+                       (blk['ang_q6'] / 64.0).tolist(), (blk['dist_q2'] / 4.0).tolist())
+            f.write('\n'.join([CSV_ROW_FMT % row for row in rows]) + '\n')
+
 
 def main():
-    ap = argparse.ArgumentParser(description='Grabación de escaneo RPLIDAR a CSV')
+    ap = argparse.ArgumentParser(description='Grabación de escaneo RPLIDAR a .npy')
     ap.add_argument('--port', required=True, help='Puerto serie')
     ap.add_argument('--seconds', type=int, default=10, help='Duración de la grabación')
     ap.add_argument('--out', default='data', help='Carpeta de salida')
+    ap.add_argument('--csv', action='store_true',
+                    help='Exportar también a CSV al terminar la grabación')
 
     # ── Decimación ────────────────────────────
     # Guarda solo 1 de cada N puntos.
@@ -39,7 +89,7 @@ def main():
     out_dir.mkdir(parents=True, exist_ok=True)
 
     # Nombre de archivo con timestamp para no sobrescribir
-    filename = out_dir / f"scan_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+    filename = out_dir / f"scan_{time.strftime('%Y%m%d_%H%M%S')}.npy"
 
     driver = LidarDriver(args.port)
     t0 = time.time()
@@ -49,40 +99,62 @@ def main():
     print(f'[INFO] Grabando {args.seconds}s → {filename}')
     print(f'[INFO] Decimación: 1 de cada {args.decimation} puntos')
 
-    try:
-        with filename.open('w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['t', 'quality', 'angle_deg', 'dist_mm'])  # header
+    header_ok = False  # True cuando la cabecera ya indica el nº real de registros
 
-            for fr in driver.frames():
-                for q, a, d in fr.pts:
+    try:
+        with filename.open('wb', buffering=WRITE_BUFFER) as f:
+            write_npy_header(f, 0)  # provisional, se corrige al cerrar
 
-                    raw_pts += 1
+            try:
+                for fr in driver.frames():
+                    n = len(fr.pts)
 
                     # ── DECIMACIÓN ──────────────────────────────
                     # Solo escribimos el punto si cumple:
-                    # raw_pts % N == 0
+                    # raw_pts % N == 0  (contando desde 1 a lo largo de toda la grabación)
                     #
                     # Ejemplo:
                     # N = 5
                     # Se escriben los puntos 5, 10, 15, 20...
-                    if raw_pts % args.decimation != 0:
-                        continue
-
-                    writer.writerow([f'{fr.t:.4f}', q, f'{a:.3f}', f'{d:.1f}'])
-                    total_pts += 1
-
-                # Finaliza cuando se cumple el tiempo solicitado
-                if time.time() - t0 >= args.seconds:
-                    break
+                    first = (-raw_pts - 1) % args.decimation
+                    sel = fr.pts[first::args.decimation]
+                    raw_pts += n
+
+                    # Un frame completo se escribe de una vez como bloque binario
+                    rec = np.empty(len(sel), dtype=RECORD_DTYPE)
+                    rec['t'] = fr.t
+                    rec['q'] = sel['q']
+                    rec['ang_q6'] = sel['ang_q6']
+                    rec['dist_q2'] = sel['dist_q2']
+                    f.write(rec.tobytes())
+                    total_pts += len(rec)  # solo cuenta los registros ya escritos
+
+                    # Finaliza cuando se cumple el tiempo solicitado
+                    if time.time() - t0 >= args.seconds:
+                        break
+
+            finally:
+                # Cabecera definitiva con el número real de registros, también si
+                # la grabación se corta (Ctrl+C, error del driver/serie): así
+                # np.load() recupera todo lo escrito hasta ese momento
+                f.seek(0)
+                write_npy_header(f, total_pts)
+                header_ok = True
 
     finally:
         driver.shutdown_safe()
+        if not header_ok:
+            print(f'[WARN] {filename}: la cabecera no se pudo actualizar (fichero incompleto)')
 
     print(f'[OK] Guardado: {filename}')
     print(f'     Puntos capturados: {raw_pts}')
     print(f'     Puntos guardados:  {total_pts}')
-    
+
+    if args.csv and header_ok:
+        csv_name = filename.with_suffix('.csv')
+        export_csv(filename, csv_name)
+        print(f'[OK] Exportado CSV: {csv_name}')
+
 
 if __name__ == '__main__':
     main()
@@ -15,34 +15,45 @@ Uso:
 from __future__ import annotations
 import argparse
 from pathlib import Path
-from lidar_driver_csv import read_scan_csv
-from lidar_processing import is_valid, polar_to_xy  # contrato interfaz
+import numpy as np
+from lidar_driver_csv import iter_scan_batches
+from lidar_processing import valid_mask, filter_and_project_arrays  # contrato interfaz
 
 
 def main(csv_in: str, out_dir_str: str):
     out = Path(out_dir_str)
     out.mkdir(parents=True, exist_ok=True)
 
-    samples = read_scan_csv(csv_in)
-    n = len(samples)
-
-    # Separar válidas e inválidas usando el módulo compartido
-    valid = [s for s in samples if is_valid(s)]
-    invalid = [s for s in samples if not is_valid(s)]
-
-    # ── Guardar puntos filtrados ──────────────────────────────────────
+    # Pipeline en streaming: cada bloque del CSV se filtra, se proyecta y se
+    # escribe antes de leer el siguiente; nunca se tiene el scan completo en memoria
+    n = n_valid = n_ok = 0
     filtered_csv = out / "filtered_points.csv"
     with filtered_csv.open("w", encoding="utf-8") as f:
         f.write("x_m,y_m,quality,angle_deg,measure_m\n")
-        for s in valid:
-            x, y = polar_to_xy(s)
-            f.write(
-                f"{x:.6f},{y:.6f},{s.quality},{s.angle:.3f},{s.measure_m:.4f}\n"
+
+        for batch in iter_scan_batches(csv_in):
+            # Separar válidas e inválidas usando el módulo compartido: el filtro se
+            # evalúa una sola vez y la misma máscara sirve para proyectar a XY
+            mask = valid_mask(batch)
+            x, y, q, a, r = filter_and_project_arrays(batch, mask)
+
+            n += len(mask)
+            n_valid += int(np.count_nonzero(mask))
+            n_ok += int(np.count_nonzero(batch['ok'] == 1))
+
+            # ── Guardar puntos filtrados ──────────────────────────────
+            # Las columnas del bloque se apilan en un array (M, 5) y numpy formatea las filas
+            np.savetxt(
+                f,
+                np.column_stack([x, y, q, a, r]),
+                fmt=["%.6f", "%.6f", "%d", "%.3f", "%.4f"],
+                delimiter=",",
             )
+    n_invalid = n - n_valid
 
     # ── Generar informe markdown ──────────────────────────────────────
-    ok_ratio = sum(1 for s in samples if s.ok == 1) / n if n else 0
-    valid_ratio = len(valid) / n if n else 0
+    ok_ratio = n_ok / n if n else 0
+    valid_ratio = n_valid / n if n else 0
 
     report = out / "report_scan.md"
     report.write_text(
@@ -51,8 +62,8 @@ def main(csv_in: str, out_dir_str: str):
 **Archivo de entrada:** `{csv_in}`  
 **Total de lecturas:** {n}  
 **ok == 1:** {ok_ratio:.2%}  
-**Válidas tras filtro (lidar_processing):** {valid_ratio:.2%} ({len(valid)} puntos)  
-**Inválidas:** {len(invalid)} puntos  
+**Válidas tras filtro (lidar_processing):** {valid_ratio:.2%} ({n_valid} puntos)  
+**Inválidas:** {n_invalid} puntos  
 
 ## Criterio de filtrado (lidar_processing.py)
 
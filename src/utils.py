@@ -25,6 +25,7 @@ Eventos posibles: 'diag_ok', 'diag_fail', 'start', 'stop', 'error'
 from __future__ import annotations
 from enum import Enum, auto
 from dataclasses import dataclass
+import numpy as np
 
 
 class State(Enum):
@@ -49,6 +50,38 @@ class Checklist:
     puerto_correcto:  bool = False  # Se ha comprobado en el SO el puerto (COMx o /dev/ttyUSBx)
 
 
+# Transiciones legales de la máquina de estados.
+# Formato: (Estado_Actual, Evento): Estado_Siguiente
+TRANSITIONS = {
+    (State.INIT,  'diag_ok'):   State.DIAG,   # Checklist superado y conexión inicial exitosa
+    (State.INIT,  'diag_fail'): State.ERROR,  # Fallo al intentar conectar con el sensor
+    (State.DIAG,  'start'):     State.SCAN,   # Diagnóstico de salud OK, arranca el motor
+    (State.SCAN,  'stop'):      State.STOP,   # Solicitud de parada (ej. usuario presiona Ctrl+C)
+    (State.STOP,  'diag_ok'):   State.DONE,   # Apagado finalizado con éxito (usamos diag_ok genérico o cualquier otro)
+    (State.STOP,  'start'):     State.DONE,   # Una vez en STOP, cualquier evento finaliza el ciclo
+    (State.STOP,  'stop'):      State.DONE,
+}
+
+# Tabla compilada a partir de TRANSITIONS (se construye una sola vez al importar):
+# _TABLE[estado.value, índice_evento] = valor del estado siguiente, 0 = sin transición.
+_EVENTS = ('diag_ok', 'diag_fail', 'start', 'stop', 'error')
+_EVENT_IDX = {ev: i for i, ev in enumerate(_EVENTS)}
+
+
+def _compile_table() -> np.ndarray:
+    """Construye _TABLE a partir de TRANSITIONS."""
+    table = np.zeros((len(State) + 1, len(_EVENTS)), dtype=np.uint8)
+    for (st, ev), nxt in TRANSITIONS.items():
+        table[st.value, _EVENT_IDX[ev]] = nxt.value
+    # Regla de seguridad global: el evento 'error' siempre aborta al estado ERROR
+    # sin importar en qué punto del ciclo de vida estemos.
+    table[:, _EVENT_IDX['error']] = State.ERROR.value
+    return table
+
+
+_TABLE = _compile_table()
+
+
 def transition(state: State, event: str) -> State:
     """
     Función pura de transición de estado que define el comportamiento del sistema.
@@ -59,26 +92,14 @@ def transition(state: State, event: str) -> State:
     Returns:
         El nuevo estado resultante tras evaluar la regla de transición.
     """
-    # Regla de seguridad global: el evento 'error' siempre aborta al estado ERROR
-    # sin importar en qué punto del ciclo de vida estemos.
-    if event == 'error':
-        return State.ERROR
-
-    # Diccionario con las transiciones legales de la máquina de estados.
-    # Formato: (Estado_Actual, Evento): Estado_Siguiente
-    transitions = {
-        (State.INIT,  'diag_ok'):   State.DIAG,   # Checklist superado y conexión inicial exitosa
-        (State.INIT,  'diag_fail'): State.ERROR,  # Fallo al intentar conectar con el sensor
-        (State.DIAG,  'start'):     State.SCAN,   # Diagnóstico de salud OK, arranca el motor
-        (State.SCAN,  'stop'):      State.STOP,   # Solicitud de parada (ej. usuario presiona Ctrl+C)
-        (State.STOP,  'diag_ok'):   State.DONE,   # Apagado finalizado con éxito (usamos diag_ok genérico o cualquier otro)
-        (State.STOP,  'start'):     State.DONE,   # Una vez en STOP, cualquier evento finaliza el ciclo
-        (State.STOP,  'stop'):      State.DONE,
-    }
-    
+    ev = _EVENT_IDX.get(event)
+    if ev is None:
+        return state  # evento desconocido: se ignora
+
     # Si la combinación (estado_actual, evento) existe, devuelve el nuevo estado.
     # Si no es una transición válida, ignora el evento y mantiene el estado actual.
-    return transitions.get((state, event), state)
+    nxt = int(_TABLE[state.value, ev])
+    return State(nxt) if nxt else state
 
 
 if __name__ == '__main__':
@@ -18,7 +18,7 @@ Diagrama de Estados FSM (pipeline CSV):
        ▼
     SHUTDOWN
 
-* Nota: Un fallo (exception) en cualquier paso deriva inmediatamente al estado ERROR.
+* Nota: Un fallo en la comprobación de cualquier paso deriva inmediatamente al estado ERROR.
 
 La parada segura aquí es simbólica (no hay motor real).
 En la integración con hardware real se llama a shutdown_safe() del driver.
@@ -38,15 +38,29 @@ class State(Enum):
     ERROR      = auto()  # Fallo en algún paso (archivo no encontrado, disco lleno, etc.)
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Checklist:
-    """Checklist de validación lógica previa al pipeline CSV."""
+    """
+    Checklist de validación lógica previa al pipeline CSV.
+    Inmutable y con __slots__ (Python >= 3.10): sin __dict__ por instancia.
+    """
     csv_exists:       bool = False  # El archivo CSV existe en la ruta especificada
     header_ok:        bool = False  # El header coincide con ['quality', 'angle', 'measure_m', 'ok']
     scan_length_ok:   bool = False  # El CSV tiene el nº esperado de filas (≥720)
     processed_ok:     bool = False  # El filtrado/proyección se completó sin lanzar excepciones
     files_saved_ok:   bool = False  # Los archivos generados se escribieron con éxito en docs/
 
+# Transiciones del pipeline, recorridas en orden por run_fsm().
+# Formato: (Estado, comprobación del checklist para entrar en él, mensaje si falla)
+TRANSITIONS = (
+    (State.LOAD,    lambda c: c.csv_exists and c.header_ok and c.scan_length_ok,  # INIT → LOAD
+     'Fallo en LOAD: CSV no válido, estructura corrupta o incompleto.'),
+    (State.PROCESS, lambda c: c.processed_ok,                                     # LOAD → PROCESS
+     'Fallo en PROCESS: error matemático en filtrado o proyección.'),
+    (State.SAVE,    lambda c: c.files_saved_ok,                                   # PROCESS → SAVE
+     'Fallo en SAVE: permisos denegados o disco lleno al guardar los archivos.'),
+)
+
 # REGLAS DE SEGURIDAD FÍSICA (Hardware Real) documentadas por Actuadores:
 # 1. El LiDAR debe montarse sobre una base estable; un vuelco con el motor a 10 Hz dañará la correa.
 # 2. No interrumpir la alimentación USB repentinamente; usar siempre stop_motor() primero.
@@ -72,36 +86,19 @@ def shutdown_safe() -> bool:
 def run_fsm(check: Checklist) -> State:
     """
     Ejecuta la FSM del pipeline CSV.
-    Avanza linealmente por los estados comprobando el checklist de validaciones en cada transición.
-    Si alguna comprobación falla, aborta a ERROR y ejecuta shutdown_safe().
+    Avanza linealmente por TRANSITIONS comprobando el checklist de validaciones en cada transición.
+    Si alguna comprobación falla, aborta a ERROR y ejecuta shutdown_safe()
+    (sin excepciones: un fallo es un resultado esperado, no un caso excepcional).
     """
-    st = State.INIT
-    try:
-        # Transición INIT → LOAD
-        st = State.LOAD
-        if not (check.csv_exists and check.header_ok and check.scan_length_ok):
-            raise ValueError('Fallo en LOAD: CSV no válido, estructura corrupta o incompleto.')
-
-        # Transición LOAD → PROCESS
-        st = State.PROCESS
-        if not check.processed_ok:
-            raise ValueError('Fallo en PROCESS: error matemático en filtrado o proyección.')
-
-        # Transición PROCESS → SAVE
-        st = State.SAVE
-        if not check.files_saved_ok:
-            raise ValueError('Fallo en SAVE: permisos denegados o disco lleno al guardar los archivos.')
-
-        # Transición SAVE → SHUTDOWN
-        st = State.SHUTDOWN
-        shutdown_safe()
-        return State.SHUTDOWN
-
-    except Exception as e:
-        # Cualquier excepción levantada nos lleva a un estado de fallo controlado
-        print(f'[FSM] ERROR crítico en estado {st.name}: {e}')
-        shutdown_safe()  # Aseguramos que siempre haya cierre limpio, incluso en fallo
-        return State.ERROR
+    for st, ok, msg in TRANSITIONS:
+        if not ok(check):
+            print(f'[FSM] ERROR crítico en estado {st.name}: {msg}')
+            shutdown_safe()  # Aseguramos que siempre haya cierre limpio, incluso en fallo
+            return State.ERROR
+
+    # Transición SAVE → SHUTDOWN
+    shutdown_safe()
+    return State.SHUTDOWN
 
 
 if __name__ == '__main__':
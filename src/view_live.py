@@ -5,9 +5,11 @@ Propietario: Visión Artificial.
 
 Cómo funciona la visualización en tiempo real con matplotlib:
   - plt.ion()  activa el modo interactivo (no bloquea el hilo)
-  - fig.canvas.draw() + fig.canvas.flush_events() refresca la ventana
-  - Esto funciona bien hasta ~8 Hz (frecuencia de rotación del sensor)
-  - Si se necesita mayor fluidez: explorar pyqtgraph o pygame
+  - Blitting: el fondo (ejes, grid, leyenda) se dibuja una vez y se cachea
+    con copy_from_bbox(); en cada frame solo se restaura ese fondo y se
+    redibujan el scatter y el texto (restore_region + draw_artist + blit)
+  - fig.canvas.draw() completo solo al arrancar o si la ventana se redimensiona
+  - Si se necesita aún más fluidez: explorar pyqtgraph o pygame
 
 Uso:
     python src/view_live.py --port /dev/ttyUSB0 --range 6.0
@@ -18,35 +20,41 @@ import argparse
 import numpy as np
 import matplotlib.pyplot as plt
 from lidar_driver import LidarDriver
+from lidar_processing import ANGLE_Q6_STEPS, COS_TABLE, SIN_TABLE
+
+# Copias float32 de las tablas compartidas: la vista trabaja en float32
+_COS32 = COS_TABLE.astype(np.float32)
+_SIN32 = SIN_TABLE.astype(np.float32)
 
 def polar_to_xy(pts):
     """
-    Convierte una lista de ScanPoints a arrays numpy X, Y.
+    Convierte los puntos de un ScanFrame a arrays numpy X, Y.
     
     Args:
-        pts: lista de tuplas (quality, angle_deg, dist_mm)
+        pts: array estructurado POINT_DTYPE (q, ang_q6, dist_q2) de ScanFrame.pts
     Returns:
-        x, y: arrays numpy en metros (solo válidos)
+        x, y: arrays numpy float32 en metros (solo válidos)
         q_valid: array numpy de calidades de puntos válidos
         total_pts: cantidad original de puntos recibidos
         valid_pts: cantidad de puntos tras el filtrado
     """
-    q   = np.array([p[0] for p in pts], dtype=float)
-    ang = np.deg2rad([p[1] for p in pts])
-    r   = np.array([p[2] for p in pts], dtype=float) / 1000.0  # mm → m
-    
+    q = pts['q']
+    d = pts['dist_q2']  # 1/4 de mm
+
     total_pts = len(pts)
 
     # IMPLEMENTACIÓN DEL FILTRO [Visión]:
-    # Rango de distancia (0.15m a 6.0m) y calidad mínima (>= 10)
-    mask = (r > 0.15) & (r < 6.0) & (q >= 10)
-    
-    ang_valid = ang[mask]
-    r_valid = r[mask]
+    # Rango de distancia (0.15m a 6.0m) y calidad mínima (>= 10),
+    # comparando en punto fijo: 0.15 m = 600 q2, 6.0 m = 24000 q2
+    mask = (d > 600) & (d < 24000) & (q >= 10)
+
+    # Solo los válidos pasan a float; el ángulo q6 indexa directamente las tablas seno/coseno
+    i = pts['ang_q6'][mask] % ANGLE_Q6_STEPS
+    r_valid = d[mask] * np.float32(1 / 4000.0)  # q2 → m
     q_valid = q[mask]
 
-    x = r_valid * np.cos(ang_valid)
-    y = r_valid * np.sin(ang_valid)
+    x = r_valid * _COS32[i]
+    y = r_valid * _SIN32[i]
     
     valid_pts = len(x)
     
@@ -81,12 +89,27 @@ def main():
     ax.legend(loc='upper right')
 
     # Scatter vacío que actualizaremos en cada frame
-    scat = ax.scatter([], [], s=4, c='cyan', alpha=0.8)
+    # animated=True: no forma parte del fondo cacheado, se dibuja a mano con blit
+    # color= + edgecolors='none': un solo color y sin pasada de borde (camino rápido)
+    scat = ax.scatter([], [], s=4, color='cyan', edgecolors='none', alpha=0.8, animated=True)
     
     # Texto de info en pantalla
     info_text = ax.text(-args.range + 0.1, args.range - 0.3, '',
-                        fontsize=9, color='white',
+                        fontsize=9, color='white', animated=True,
                         bbox=dict(boxstyle='round', facecolor='black', alpha=0.5))
+
+    # Fondo para blitting: se vuelve a capturar en cada redibujado completo
+    # (primer draw, redimensionado de ventana...) mediante 'draw_event'.
+    # Se usa fig.bbox porque el cuadro de info sobresale por encima de los ejes.
+    blit = {'bg': None}
+    def cache_background(event=None):
+        blit['bg'] = fig.canvas.copy_from_bbox(fig.bbox)
+    fig.canvas.mpl_connect('draw_event', cache_background)
+    fig.canvas.draw()
+
+    # Buffer (Nmax, 2) reutilizado para los offsets del scatter (evita np.c_ por frame).
+    # Un barrido del A1M8 ronda los 1000-1500 puntos; se amplía si algún frame no cabe.
+    offsets = np.empty((8192, 2), dtype=np.float32)
     
     frame_count = 0
     capture_saved = False # Flag para guardar solo una vez y no saturar el disco
@@ -96,7 +119,12 @@ def main():
             x, y, q_valid, total_pts, valid_pts = polar_to_xy(fr.pts)
             
             # Actualizar puntos en el scatter
-            scat.set_offsets(np.c_[x, y])
+            n = len(x)
+            if n > len(offsets):
+                offsets = np.empty((2 * n, 2), dtype=np.float32)
+            offsets[:n, 0] = x
+            offsets[:n, 1] = y
+            scat.set_offsets(offsets[:n])
             
             # Actualizar información en pantalla (estadísticas)
             frame_count += 1
@@ -108,15 +136,25 @@ def main():
                 f'Válidos: {pct_valid:.1f}%'
             )
             
-            # Refrescar la ventana (clave para tiempo real)
-            fig.canvas.draw()
+            # Refrescar la ventana (clave para tiempo real): solo los artistas animados
+            fig.canvas.restore_region(blit['bg'])
+            ax.draw_artist(scat)
+            ax.draw_artist(info_text)
+            fig.canvas.blit(fig.bbox)
             fig.canvas.flush_events()
             
             # IMPLEMENTACIÓN CAPTURA [Visión]:
             # Guardar captura automáticamente al llegar al frame 20 (para asegurar que hay datos en pantalla)
             if frame_count == 20 and not capture_saved:
                 os.makedirs('docs/capturas', exist_ok=True)
+                # savefig omite los artistas animados: se desactiva durante la captura
+                # y después se redibuja para recuperar un fondo limpio
+                for artist in (scat, info_text):
+                    artist.set_animated(False)
                 fig.savefig('docs/capturas/live_view.png')
+                for artist in (scat, info_text):
+                    artist.set_animated(True)
+                fig.canvas.draw()
                 print('\n[INFO] Captura automática guardada en docs/capturas/live_view.png')
                 capture_saved = True
 
@@ -13,36 +13,168 @@ Uso:
     python src/view_live_csv.py --csv data/scan_720.csv --animate
 """
 from __future__ import annotations
-import os
-import time
+import functools
+import math
 import argparse
+from pathlib import Path
 import numpy as np
 import matplotlib.pyplot as plt
-from lidar_driver_csv import read_scan_csv
-from lidar_processing import filter_and_project  # Contrato de interfaz: realiza el filtrado y proyección XY
+from matplotlib.animation import FuncAnimation
+from lidar_driver_csv import read_scan_cached, save_npy_atomic
+import lidar_processing
+from lidar_processing import filter_and_project_arrays  # Contrato de interfaz: realiza el filtrado y proyección XY
+from lidar_processing import ANGLE_Q6_STEPS, COS_TABLE, SIN_TABLE, angle_index
+
+# Copias float32 de las tablas compartidas: la visualización trabaja en float32
+_COS32 = COS_TABLE.astype(np.float32)
+_SIN32 = SIN_TABLE.astype(np.float32)
+
+# Grados → radianes como una sola multiplicación float32 (equivale a np.deg2rad)
+DEG2RAD = np.float32(math.pi / 180.0)
+
+# Criterio de "inválido" para el diagnóstico visual (lógica del sensor):
+# calidad baja o distancia fuera del rango operativo (15cm - 6m)
+INV_QUALITY_MIN = 10
+INV_DIST_MIN_M  = 0.15
+INV_DIST_MAX_M  = 6.0
+
+# Por debajo de este nº de muestras no compensa el kernel numba y se usa numpy
+NUMBA_MIN_SIZE = 1 << 16
+
+# Refresco máximo de la animación: por encima la pantalla no llega a mostrar los frames
+MAX_FPS = 60
+MIN_DT = 1.0 / MAX_FPS
+
+def polar_to_xy(angle_deg, r, out_x=None, out_y=None):
+    """
+    Proyección polar → cartesiana escribiendo en buffers (out=), sin temporales.
+    Sin trigonometría: el ángulo se redondea al paso de 1/64° del sensor y se
+    leen COS_TABLE / SIN_TABLE de lidar_processing (igual que los puntos válidos).
+    
+    Args:
+        angle_deg: array de ángulos en grados
+        r: array de distancias en metros
+        out_x, out_y: buffers de salida (float32 con la forma de r si no se pasan)
+    Returns:
+        out_x, out_y: coordenadas X, Y en metros
+    """
+    if out_x is None:
+        out_x = np.empty_like(r, dtype=np.float32)
+    if out_y is None:
+        out_y = np.empty_like(r, dtype=np.float32)
+    i = angle_index(angle_deg)
+    np.take(_COS32, i, out=out_x)
+    out_x *= r
+    np.take(_SIN32, i, out=out_y)
+    out_y *= r
+    return out_x, out_y
+
+@functools.lru_cache(maxsize=None)
+def _invalid_xy_kernel():
+    """
+    Kernel numba de invalid_to_xy(), o None si numba no está instalado.
+    numba (opcional) se importa y el kernel se compila solo la primera vez que
+    se pide: un scan pequeño no paga el coste de importarlo.
+    """
+    try:
+        from numba import njit  # opcional: filtro + proyección de inválidos en un solo bucle compilado
+    except ImportError:
+        return None
+
+    @njit(cache=True)
+    def kernel(q, ang_deg, meas_m, qmin, dmin, dmax, cos_t, sin_t, out_x, out_y):
+        # Una sola pasada: filtro, índice en las tablas seno/coseno y proyección,
+        # compactando los inválidos al principio de out_x / out_y. Devuelve cuántos hay.
+        k = 0
+        for i in range(q.shape[0]):
+            d = meas_m[i]
+            if q[i] < qmin or d < dmin or d > dmax:
+                j = int(round(ang_deg[i] * 64)) % ANGLE_Q6_STEPS
+                out_x[k] = d * cos_t[j]
+                out_y[k] = d * sin_t[j]
+                k += 1
+        return k
+
+    return kernel
+
+def invalid_to_xy(scan):
+    """
+    Coordenadas X, Y de las muestras inválidas (solo para visualizarlas).
+    
+    Args:
+        scan: dict SoA de lidar_driver_csv (quality, angle, measure_m)
+    Returns:
+        inv_xs, inv_ys: arrays numpy float32 en metros
+    """
+    q, ang_deg, meas_m = scan['quality'], scan['angle'], scan['measure_m']
+    # Umbrales con el dtype de la columna: mismo resultado en numba que en numpy
+    dmin, dmax = meas_m.dtype.type(INV_DIST_MIN_M), meas_m.dtype.type(INV_DIST_MAX_M)
+
+    kernel = _invalid_xy_kernel() if len(q) >= NUMBA_MIN_SIZE else None
+    if kernel is not None:
+        out_x = np.empty(len(q), dtype=np.float32)
+        out_y = np.empty(len(q), dtype=np.float32)
+        k = kernel(q, ang_deg, meas_m, INV_QUALITY_MIN, dmin, dmax,
+                   _COS32, _SIN32, out_x, out_y)
+        return out_x[:k], out_y[:k]
+
+    # Máscara vectorizada sobre las columnas del scan (measure_m ya viene en metros)
+    invalid = (q < INV_QUALITY_MIN) | (meas_m < dmin) | (meas_m > dmax)
+    return polar_to_xy(ang_deg[invalid], meas_m[invalid])
+
+@functools.lru_cache(maxsize=None)
+def _ensure_dir(path: str) -> Path:
+    """Crea la carpeta (y sus padres) solo la primera vez que se pide en el proceso."""
+    p = Path(path)
+    p.mkdir(parents=True, exist_ok=True)
+    return p
+
+def load_points_cached(csv_path: str, scan) -> np.ndarray:
+    """
+    Puntos válidos proyectados como array (N, 5) float32 (x, y, quality, angle, distance),
+    con una copia '<csv>.pts.npy' junto al CSV. Si esa copia existe y no es más antigua
+    que el CSV ni que lidar_processing.py (umbrales del filtro) se abre con
+    np.load(mmap_mode='r') y no se vuelve a filtrar ni proyectar.
+    Una copia ilegible (truncada, corrupta) se trata como si no existiera.
+    """
+    src_path = Path(csv_path)
+    cache_path = src_path.with_name(src_path.name + '.pts.npy')
+    newest_src = max(src_path.stat().st_mtime, Path(lidar_processing.__file__).stat().st_mtime)
+
+    if cache_path.exists() and cache_path.stat().st_mtime >= newest_src:
+        try:
+            pts_arr = np.load(cache_path, mmap_mode='r')
+        except (OSError, ValueError) as e:
+            print(f'[WARN] load_points_cached: copia {cache_path} ilegible, se regenera: {e}')
+        else:
+            if pts_arr.dtype == np.float32 and pts_arr.ndim == 2 and pts_arr.shape[1] == 5:
+                return pts_arr
+            del pts_arr  # cerrar el mapeo antes de reemplazar el fichero (Windows)
+
+    pts_arr = np.column_stack(filter_and_project_arrays(scan)).astype(np.float32, copy=False)
+    try:
+        save_npy_atomic(cache_path, pts_arr)
+    except OSError as e:
+        print(f'[WARN] load_points_cached: no se pudo guardar {cache_path}: {e}')
+    return pts_arr
 
 def main(csv_path: str, animate: bool, step: int, delay: float):
     # 1. CARGA DE DATOS: Lee el archivo CSV generado por el driver
-    samples = read_scan_csv(csv_path)
-    n_total = len(samples)
+    scan = read_scan_cached(csv_path)  # dict SoA: un array numpy por columna
+    n_total = len(scan['quality'])
     
     # 2. PROCESAMIENTO: Proyectar puntos válidos usando el módulo compartido de Visión
-    # El formato esperado de pts es: [(x, y, quality, angle, distance), ...]
-    pts = filter_and_project(samples)  
-    n_valid = len(pts)
+    # pts_arr es un array (N, 5) float32 con columnas x, y, quality, angle, distance:
+    # cada columna se usa después como vista pts_arr[:, k] sin copiar.
+    # float32 en toda la visualización: sobra precisión para metros/radianes y
+    # Agg acepta los offsets float32 directamente (la mitad de memoria que float64)
+    # Con caché en disco: a partir de la segunda ejecución no se recalcula
+    pts_arr = load_points_cached(csv_path, scan)
+    n_valid = len(pts_arr)
+    theta = pts_arr[:, 3] * DEG2RAD # ángulos en radianes para la vista polar (una vez)
     pct_valid = n_valid / n_total * 100 if n_total > 0 else 0
 
-    # 3. IDENTIFICACIÓN DE RUIDO/ERRORES: Extraer puntos inválidos para diagnóstico visual
-    # Se replica la lógica del sensor: calidad baja (<10) o distancias fuera del rango operativo (15cm - 6m)
-    invalid_samples = [s for s in samples if s[0] < 10 or (s[2]/1000.0) < 0.15 or (s[2]/1000.0) > 6.0]
-    inv_angles = np.deg2rad([s[1] for s in invalid_samples]) # Conversión a radianes para trigonometría
-    inv_dists = [s[2]/1000.0 for s in invalid_samples]       # Conversión mm -> metros
-    
-    # Transformación manual a Cartesiano para los puntos inválidos (solo visualización)
-    inv_xs = inv_dists * np.cos(inv_angles)
-    inv_ys = inv_dists * np.sin(inv_angles)
-
-    # 4. CONFIGURACIÓN DE LA FIGURA: 2 Subplots (Cartesiano y Polar)
+    # 3. CONFIGURACIÓN DE LA FIGURA: 2 Subplots (Cartesiano y Polar)
     fig = plt.figure(figsize=(14, 7))
     fig.suptitle(f'RPLIDAR scan desde CSV | {n_valid}/{n_total} válidos ({pct_valid:.1f}%)', fontsize=14)
     
@@ -63,60 +195,77 @@ def main(csv_path: str, animate: bool, step: int, delay: float):
 
     # --- MODO ESTÁTICO (Renderizado Único) ---
     if not animate:
-        # Extraer coordenadas de la lista de tuplas 'pts'
-        xs = [p[0] for p in pts]
-        ys = [p[1] for p in pts]
+        # Extraer coordenadas (vistas de columnas de pts_arr)
+        xs = pts_arr[:, 0]
+        ys = pts_arr[:, 1]
+
+        # 4. IDENTIFICACIÓN DE RUIDO/ERRORES: Extraer puntos inválidos para diagnóstico visual
+        # Se replica la lógica del sensor: calidad baja (<10) o distancias fuera del rango operativo (15cm - 6m)
+        # Solo se dibujan aquí, así que en modo animado no se calculan
+        inv_xs, inv_ys = invalid_to_xy(scan)
         
         # Dibujar en Cartesiano: puntos válidos (cian) e inválidos (rojos/x)
-        ax1.scatter(xs, ys, s=6, c='cyan', alpha=0.8, label='Válidos')
+        # rasterized=True: los puntos se componen como una sola imagen, los ejes siguen vectoriales
+        # color= (un único color) + edgecolors='none': camino rápido de draw_markers, sin
+        # mapeo de color por punto ni segunda pasada de borde. La 'x' no tiene relleno:
+        # se dibuja solo con el borde, así que ahí se mantiene.
+        ax1.scatter(xs, ys, s=6, color='cyan', edgecolors='none', alpha=0.8, label='Válidos',
+                    rasterized=True)
         if len(inv_xs) > 0:
-            ax1.scatter(inv_xs, inv_ys, s=4, c='red', marker='x', alpha=0.5, label='Inválidos')
+            ax1.scatter(inv_xs, inv_ys, s=4, color='red', marker='x', alpha=0.5, label='Inválidos',
+                        rasterized=True)
         ax1.legend()
         
         # Dibujar en Polar: requiere ángulos en radianes y distancias en metros
-        angles = np.deg2rad([p[3] for p in pts])
-        dists = [p[4] for p in pts]
-        ax2.scatter(angles, dists, s=6, c='magenta', alpha=0.8)
+        dists = pts_arr[:, 4]
+        ax2.scatter(theta, dists, s=6, color='magenta', edgecolors='none', alpha=0.8, rasterized=True)
 
         # GUARDAR CAPTURA AUTOMÁTICA: Para documentación y reportes
-        os.makedirs('docs/capturas', exist_ok=True)
-        save_path = 'docs/capturas/live_view_csv.png'
-        plt.savefig(save_path)
+        save_path = _ensure_dir('docs/capturas') / 'live_view_csv.png'
+        plt.savefig(save_path, dpi=150)  # DPI explícito = resolución de la capa rasterizada
         print(f"\n[INFO] Captura CSV guardada automáticamente en {save_path}")
 
         plt.show()
         return
 
     # --- MODO ANIMADO (Simulación de Barrido Real-Time) ---
-    xs, ys = [], []
-    angles_anim, dists_anim = [], []
+    # Offsets precalculados una sola vez: en cada frame solo se pasa una vista
+    # con los primeros 'end' puntos (sin listas que crecen ni zip por frame)
+    xy = pts_arr[:, :2]
+    # Nota: set_offsets en proyecciones polares espera la tupla (theta, r)
+    theta_r = np.column_stack((theta, pts_arr[:, 4]))
     
-    # Inicializar objetos scatter vacíos para actualizar sus datos en el bucle
-    scat_xy = ax1.scatter(xs, ys, s=6, c='cyan', alpha=0.8)
-    scat_polar = ax2.scatter(angles_anim, dists_anim, s=6, c='magenta', alpha=0.8)
-    
-    plt.ion() # Activar modo interactivo de Matplotlib
-    for i in range(0, len(pts), step):
-        chunk = pts[i:i + step] # Procesar puntos en bloques para mayor fluidez
-        
-        # Actualización de datos Cartesianos (XY)
-        xs.extend(p[0] for p in chunk)
-        ys.extend(p[1] for p in chunk)
-        scat_xy.set_offsets(list(zip(xs, ys))) # Actualizar posiciones en el gráfico
-        
-        # Actualización de datos Polares (Theta, R)
-        angles_anim.extend(np.deg2rad([p[3] for p in chunk]))
-        dists_anim.extend(p[4] for p in chunk)
-        # Nota: set_offsets en proyecciones polares espera la tupla (theta, r)
-        scat_polar.set_offsets(list(zip(angles_anim, dists_anim)))
-        
-        # Actualizar título dinámicamente con el progreso
-        ax1.set_title(f'CSV animado | {len(xs)}/{n_valid} puntos trazados')
-        plt.pause(0.001) # Forzar refresco de la interfaz gráfica
-        time.sleep(delay) # Controlar la velocidad de la animación
+    # Inicializar objetos scatter vacíos para actualizar sus datos en cada frame
+    scat_xy = ax1.scatter([], [], s=6, color='cyan', edgecolors='none', alpha=0.8)
+    scat_polar = ax2.scatter([], [], s=6, color='magenta', edgecolors='none', alpha=0.8)
+    # Progreso dentro de ax1: con blit solo se refresca el área de los ejes,
+    # así que un set_title() por frame no llegaría a verse
+    ax1.set_title('CSV animado')
+    progress = ax1.text(0.02, 0.98, '', transform=ax1.transAxes, va='top', fontsize=9,
+                        bbox=dict(boxstyle='round', facecolor='white', alpha=0.7))
+
+    # Si --delay pide más de MAX_FPS frames por segundo, se agrupan varios pasos
+    # en un solo redibujado: el barrido avanza al mismo ritmo con menos draws.
+    # El último frame siempre llega a n_valid (todos los puntos dibujados).
+    steps_per_draw = math.ceil(MIN_DT / delay) if delay > 0 else 1
+    draw_step = step * steps_per_draw
+    interval_s = max(delay * steps_per_draw, MIN_DT)
+
+    def update(frame_idx):
+        end = min((frame_idx + 1) * draw_step, n_valid) # Procesar puntos en bloques para mayor fluidez
         
-    plt.ioff() # Desactivar modo interactivo al finalizar
+        # Actualización de datos Cartesianos (XY) y Polares (Theta, R)
+        scat_xy.set_offsets(xy[:end])
+        scat_polar.set_offsets(theta_r[:end])
+        progress.set_text(f'{end}/{n_valid} puntos trazados')
+        return scat_xy, scat_polar, progress
+
+    # FuncAnimation: un único temporizador del backend dirige la animación y, con
+    # blit=True, cachea el fondo y redibuja solo los artistas devueltos por update()
+    anim = FuncAnimation(fig, update, frames=max(1, math.ceil(n_valid / draw_step)),
+                         interval=interval_s * 1000, blit=True, repeat=False)
     plt.show()
+    return anim # mantener la referencia: si se recolecta, la animación se detiene
 
 if __name__ == '__main__':
     # Configuración de argumentos por línea de comandos
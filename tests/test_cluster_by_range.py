@@ -0,0 +1,40 @@
+"""
+Pruebas de lidar_processing.cluster_by_range().
+Uso:
+    python -m pytest -q tests
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+from lidar_processing import cluster_by_range  # noqa: E402
+
+
+def _points(angles_deg, r=1.0):
+    angle = np.asarray(angles_deg, dtype=np.float64)
+    r = np.full(angle.shape, r)
+    rad = np.deg2rad(angle)
+    return r * np.cos(rad), r * np.sin(rad), r, angle
+
+
+def test_no_wrap_merge_across_distant_angles():
+    # Mismo rango pero en lados opuestos del sensor: no se tocan en 0°
+    labels, centroids, sizes = cluster_by_range(*_points([10, 11, 12, 200, 201, 202]))
+    assert sorted(sizes.tolist()) == [3, 3]
+    assert len(set(labels.tolist())) == 2
+    assert np.all(np.hypot(centroids[:, 0], centroids[:, 1]) > 0.9)
+
+
+def test_angular_gap_splits_segments():
+    # Dos paredes a rango parecido separadas por un hueco (puntos filtrados)
+    labels, _, sizes = cluster_by_range(*_points([30, 31, 32, 60, 61, 62]))
+    assert sizes.tolist() == [3, 3]
+    assert labels[0] != labels[3]
+
+
+def test_object_crossing_zero_is_one_cluster():
+    labels, _, sizes = cluster_by_range(*_points([0, 1, 2, 100, 101, 102, 358, 359]))
+    assert sorted(sizes.tolist()) == [3, 5]
+    assert labels[0] == labels[-1]